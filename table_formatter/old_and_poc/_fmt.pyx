@@ -0,0 +1,39 @@
+# cython: language_level=3
+"""
+compiled version of table_formatter.format_row (same behavior), picked up by table_formatter.py when built:
+    python3 setup.py build_ext --inplace
+"""
+
+import re
+cimport cython
+
+# same as table_formatter.ANSI_ESCAPE
+cdef object ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef str format_row(list cells, list widths, list is_numeric, int sep_width, bint has_ansi=True):
+    cdef Py_ssize_t i, vis_len, width, padded_width
+    cdef Py_ssize_t n = len(widths)
+    cdef Py_ssize_t num_cells = len(cells)
+    cdef str cell
+    cdef list formatted = []
+
+    if len(is_numeric) < n:  # checked once here, since the loop's indexing is unchecked
+        raise IndexError('is_numeric is shorter than widths')
+
+    for i in range(n):
+        width = widths[i]
+        cell = cells[i] if i < num_cells else ''
+        if has_ansi and '\x1b' in cell:
+            vis_len = len(ANSI_ESCAPE.sub('', cell))
+            padded_width = width + len(cell) - vis_len  # invisible chars (colors) don't take up width
+        else:
+            padded_width = width
+        if is_numeric[i]:
+            formatted.append(cell.rjust(padded_width))  # right-align
+        else:
+            formatted.append(cell.ljust(padded_width))  # left-align
+
+    return (' ' * sep_width).join(formatted)
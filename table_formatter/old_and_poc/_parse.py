@@ -0,0 +1,14 @@
+#!/usr/bin/python3
+
+"""
+row tokenizing shared by format_into_columns.py and table_formatter.py
+"""
+
+import re
+
+# Split on 2+ spaces OR 1+ tabs
+SPLIT_PATTERN = re.compile(r"\s{2,}|\t+")
+
+
+def split_row(line: str) -> list[str]:
+    return SPLIT_PATTERN.split(line.strip())
@@ -3,12 +3,12 @@
 """
 reorganizes table-intended text (such as in .csv or .wsv formats) so that columns align, for proper human readability
 flags: --prepend: prefix the spaces instead of suffixing them
+       --shell-quoting: split words like a shell would (on single spaces, with quotes grouping words) instead of on 2+ spaces or tabs
 """
 
-# TODO - handle quotes better
+# TODO - handle quotes better (with --shell-quoting)
 #   lone double-quotes crash the program
 #   maybe user doesn't want the quotes removed (during arg separation evaluation, by shlex.split()) - have a flag that adds-in quotes to "words" with spaces within (needs to be done early)
-# TODO - accept a single space as non-separator (need at least 2, or a tab). That way a formatted table output would be the same as its re-formatting
 
 
 import sys
@@ -16,50 +16,59 @@ import os
 import shlex
 import re
 
+from _parse import split_row  # shared with table_formatter.py
+
 COLUMN_SPACING = '  '  # 2 spaces
 NUMERICALLY_NEUTRAL = '-'
 
+# compiled once, not per call (these get hit for every word in the table)
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+_NUM_RE = re.compile(r'^[+-]?[0-9]+(\.[0-9]+)?\s?[pKkMmGgTt]?((i?[bB]?(/s)?)|(%?)|((@[0-9]+)?(Hz)?))$')
+
 
 # allows spacing without consideration of special invisible characters (like coloring), so it'll align WITH colors
 def strip_ansi(text):
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text)
+    return text if '\x1b' not in text else _ANSI_RE.sub('', text)  # most words have no escapes; skip the regex for them
 
 
 def is_num_or_unit(input):
-    pattern = r'^[+-]?[0-9]+(\.[0-9]+)?\s?[pKkMmGgTt]?((i?[bB]?(/s)?)|(%?)|((@[0-9]+)?(Hz)?))$'
-    return bool(re.match(pattern, input))
+    return bool(_NUM_RE.match(input))
 
 
-def format_table(text: str, align_left=True):
+def format_table(text: str, align_left=True, shell_quoting=False):
     lines = text.splitlines()
-    matrix = [shlex.split(line) for line in lines]
+    if shell_quoting:
+        matrix = [shlex.split(line) for line in lines]
+    else:
+        matrix = [split_row(line) if line.strip() else [] for line in lines]  # blank lines stay blank
+    rows_with_ansi = ['\x1b' in line for line in lines]  # most rows have no colors, so they can skip the invisible-chars accounting
 
-    col_word_lengths = {}  # column_index: max_word_length
-    col_numerical_majority = {}  # column_index: int (positive means more numbers, negative means more strings)
+    ncols = max(map(len, matrix), default=0)
+    col_word_lengths = [0] * ncols  # max word length, per column index
+    col_numerical_majority = [0] * ncols  # per column index: positive means more numbers, negative means more strings
 
     # get max length of words in each column
-    for row in matrix:
+    for row, has_ansi in zip(matrix, rows_with_ansi):
         for j, word in enumerate(row):
-            col_word_lengths[j] = max(col_word_lengths.get(j, 0), len(strip_ansi(word)))
+            if (word_length := len(strip_ansi(word)) if has_ansi else len(word)) > col_word_lengths[j]:
+                col_word_lengths[j] = word_length
             if word != NUMERICALLY_NEUTRAL:  # ignore word if it could be either a number or not
-                col_numerical_majority[j] = col_numerical_majority.get(j, 0) + (1 if is_num_or_unit(word) else -1)
+                col_numerical_majority[j] += 1 if is_num_or_unit(word) else -1
 
-    def pad_word(a_word, index):
-        removed_chars_count = len(a_word) - len(strip_ansi(a_word))  # char-count ignores colors and other unseen chars
-        padding_total = col_word_lengths.get(index, 0) + removed_chars_count
+    def pad_word(a_word, index, has_ansi):
+        removed_chars_count = len(a_word) - len(strip_ansi(a_word)) if has_ansi else 0  # char-count ignores colors and other unseen chars
+        padding_total = col_word_lengths[index] + removed_chars_count
         # numbers need to be RTL, because it makes the MSB (most significant bit) stand out rather than the LSB.
         # the config doesn't matter; if a number/neutral-char is in a majority-numerical column, align it right
-        is_align_right_anyway = col_numerical_majority.get(index, 0) > 0 and (is_num_or_unit(a_word) or a_word == NUMERICALLY_NEUTRAL)
+        is_align_right_anyway = col_numerical_majority[index] > 0 and (is_num_or_unit(a_word) or a_word == NUMERICALLY_NEUTRAL)
         return a_word.rjust(padding_total) if not align_left or is_align_right_anyway else a_word.ljust(padding_total)
 
     # pad all words to make columns uniform
-    for i, row in enumerate(matrix):
-        matrix[i] = [pad_word(word, i) for i, word in enumerate(row)]
+    for i, (row, has_ansi) in enumerate(zip(matrix, rows_with_ansi)):
+        matrix[i] = [pad_word(word, j, has_ansi) for j, word in enumerate(row)]
 
-    # Print the padded matrix without commas or brackets
-    for row in matrix:
-        print(COLUMN_SPACING.join(row))
+    # Print the padded matrix without commas or brackets, through stdout's buffer rather than a print per row
+    sys.stdout.writelines(COLUMN_SPACING.join(row) + '\n' for row in matrix)
 
 
 if __name__ == "__main__":
@@ -70,6 +79,12 @@ if __name__ == "__main__":
         del sys.argv[sys.argv.index("--prepend")]  # get rid of the flag, so it won't cause problems later
         align_left = False
 
+    # checking for '--shell-quoting' flag
+    shell_quoting = False  # by default, words are separated by 2+ spaces or tabs
+    if '--shell-quoting' in sys.argv:
+        del sys.argv[sys.argv.index("--shell-quoting")]
+        shell_quoting = True
+
     # determining what's the data we'll work with
     input_text = ''
     if len(sys.argv) == 2 and sys.argv[1]:  # arg 0 is this file
@@ -84,7 +99,7 @@ if __name__ == "__main__":
         print("You need to provide text as an arg or stdin")
         exit(1)
 
-    format_table(input_text, align_left)
+    format_table(input_text, align_left, shell_quoting)
     exit(0)
 
 # Add tests below this line
@@ -93,6 +108,12 @@ import unittest
 
 class TestingFunctionality(unittest.TestCase):
     SAMPLE_TABLE = """
+num  word  a  b  long_word
+1  one
+2  very long  a  b  c  d  e  f
+5k  a  b  c
+"""
+    SHELL_QUOTED_TABLE = """
 num word a b long_word
 1 one
 2 "very long" a b c d e f
@@ -133,6 +154,9 @@ num       word  a  b  long_word
     def test_prepended2(self):
         self.assert_as_bash_cmd(f"'{self.CURRENT_FILE_PATH}' '{self.SAMPLE_TABLE}' --prepend", self.SAMPLE_RTL_OUTPUT)
 
+    def test_shell_quoting(self):
+        self.assert_as_bash_cmd(f"'{self.CURRENT_FILE_PATH}' --shell-quoting '{self.SHELL_QUOTED_TABLE}'", self.SAMPLE_OUTPUT)
+
     def test_echoed(self):
         self.assert_as_bash_cmd(f"echo '{self.SAMPLE_TABLE}' | {self.CURRENT_FILE_PATH}", self.SAMPLE_OUTPUT)
 
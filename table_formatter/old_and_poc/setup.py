@@ -0,0 +1,10 @@
+#!/usr/bin/python3
+
+# builds the optional compiled helpers for table_formatter.py:  python3 setup.py build_ext --inplace
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='table_formatter_fmt',
+    ext_modules=cythonize("_fmt.pyx"),
+)
@@ -1,14 +1,24 @@
 #!/usr/bin/python3
 
 import argparse
+import concurrent.futures
+import functools
+import itertools
+import os
 import re
 import sys
+from collections.abc import Iterable
+
+from _parse import split_row  # shared with format_into_columns.py
 
 # ——— Configuration ——————————————————————————————
 DEFAULT_SEPARATOR = 2
 
-# Split on 2+ spaces OR 1+ tabs
-SPLIT_PATTERN = re.compile(r"\s{2,}|\t+")
+# With --parallel, the column analysis is only split across processes above this many rows (below it, starting them costs more than it saves)
+PARALLEL_MIN_ROWS = 10_000
+
+# Below this many rows, generating a table-specific row formatter costs more than it saves
+CODEGEN_MIN_ROWS = 100
 
 # Strip ANSI escape codes
 ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
@@ -25,63 +35,158 @@ NEUTRAL_VALUES = {'', '-', '--', '---', '*', '−', '=', 'y', 'n'}
 
 # ——— Utilities ——————————————————————————————————————
 def strip_ansi(text: str) -> str:
-    return ANSI_ESCAPE.sub('', text)
+    return text if '\x1b' not in text else ANSI_ESCAPE.sub('', text)  # cheap containment check before entering the regex engine
+
+
+def visible_len(text: str) -> int:
+    """ length as seen on the terminal, without building the stripped string """
+    return len(text) - sum(len(m.group(0)) for m in ANSI_ESCAPE.finditer(text)) if '\x1b' in text else len(text)
+
+
+# cached, since tables tend to repeat values ('-', 'y', etc.)
+@functools.lru_cache(maxsize=4096)
+def is_numeric_or_neutral_clean(clean_text: str) -> bool:
+    """ same as is_numeric_or_neutral, for text that's already been through strip_ansi """
+    return (clean := clean_text.strip()) in NEUTRAL_VALUES or bool(NUMERIC_PATTERN.match(clean))
 
 
 def is_numeric_or_neutral(text: str) -> bool:
-    return (clean := strip_ansi(text).strip()) in NEUTRAL_VALUES or bool(NUMERIC_PATTERN.match(clean))
+    return is_numeric_or_neutral_clean(strip_ansi(text))
+
+
+def usable_cpus() -> int:
+    """ CPUs this process may run on (unlike os.cpu_count, respects CPU affinity; CFS quotas like docker --cpus aren't considered) """
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
 
+def detect_column_properties(rows: list[list[str]], has_ansi: bool = True, parallel: bool = False) -> tuple[list[int], list[bool]]:
+    """
+    has_ansi=False (no escape codes anywhere in the rows) skips all the ANSI stripping.
+    parallel=True splits large tables across processes; opt-in, since sending the rows to the workers costs about as much as the analysis
+    """
+    if not rows:
+        return [], []
+
+    if parallel and len(rows) > PARALLEL_MIN_ROWS and usable_cpus() > 1:
+        return detect_column_properties_parallel(rows, has_ansi=has_ansi)
+    return column_properties(rows, has_ansi=has_ansi)
+
+
+def column_properties(rows: list[list[str]], has_header: bool = True, has_ansi: bool = True) -> tuple[list[int], list[bool]]:
+    # transpose into columns; short rows are padded with '' (zero width, and counts as neutral)
+    cols = list(itertools.zip_longest(*rows, fillvalue=''))
 
-def split_row(line: str) -> list[str]:
-    return SPLIT_PATTERN.split(line.strip())
+    clean_cols = [list(map(strip_ansi, col)) for col in cols] if has_ansi else cols   # stripped once, used for both width and numeric checks
+    first_data_row = 1 if has_header else 0                     # the header doesn't vote on whether a column is numeric
 
+    widths = [max(map(len, col)) for col in clean_cols]                                               # largest value found
+    is_numeric = [all(map(is_numeric_or_neutral_clean, col[first_data_row:])) for col in clean_cols]  # false if any value isn't numeric
 
-def detect_column_properties(rows: list[list[str]]) -> tuple[list[int], list[bool]]:
+    return widths, is_numeric
+
+
+def detect_column_properties_parallel(rows: list[list[str]], workers: int | None = None, has_ansi: bool = True) -> tuple[list[int], list[bool]]:
+    """ same as detect_column_properties, with contiguous chunks of rows analyzed in separate processes """
     if not rows:
         return [], []
 
-    num_cols = max(map(len, rows))
-    is_numeric = [True] * num_cols
-    widths = [0] * num_cols
+    workers = workers or usable_cpus()
+    chunk_size = -(-len(rows) // workers)  # ceil
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    has_header = [i == 0 for i in range(len(chunks))]  # only the first chunk starts with the header
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(column_properties, chunks, has_header, itertools.repeat(has_ansi)))
+
+    all_widths, all_numeric = zip(*results)
+    widths = [max(ws) for ws in itertools.zip_longest(*all_widths, fillvalue=0)]
+    is_numeric = [all(ns) for ns in itertools.zip_longest(*all_numeric, fillvalue=True)]
+    return widths, is_numeric
+
+
+def scan_column_properties(rows: Iterable[list[str]]) -> tuple[list[int], list[bool]]:
+    """ same as detect_column_properties, but takes the rows one at a time, so they needn't all be in memory """
+    widths: list[int] = []
+    is_numeric: list[bool] = []
 
-    # Determine column widths
     for row_index, row in enumerate(rows):
-        for i, cell in enumerate(row):
-            widths[i] = max(widths[i], len(strip_ansi(cell)))                           # largest value found
-            is_numeric[i] &= (is_numeric_or_neutral(cell) if row_index > 0 else True)   # false if any value isn't numeric. Don't check numeric if on first row, i.e. header
+        if (missing := len(row) - len(widths)) > 0:   # row is wider than anything seen so far
+            widths += [0] * missing
+            is_numeric += [True] * missing
+        for i, clean in enumerate(map(strip_ansi, row)):
+            widths[i] = max(widths[i], len(clean))
+            if row_index > 0:   # first row is the header
+                is_numeric[i] = is_numeric[i] and is_numeric_or_neutral_clean(clean)
 
     return widths, is_numeric
-    
 
-def format_row(cells: list[str], widths: list[int], is_numeric: list[bool], sep_width: int) -> str:
+
+def format_row(cells: list[str], widths: list[int], is_numeric: list[bool], sep_width: int, has_ansi: bool = True) -> str:
+    """ has_ansi=False (no escape codes in the row) skips the invisible-chars correction """
     spacer = ' ' * sep_width
     formatted = []
 
     for i, width in enumerate(widths):
         cell = cells[i] if i < len(cells) else ''
-        vis_len = len(strip_ansi(cell))
-        pad = (width - vis_len) * ' '
+        padded_width = width + len(cell) - visible_len(cell) if has_ansi else width  # invisible chars (colors) don't take up width
         if is_numeric[i]:
-            formatted.append(pad + cell)  # right-align
+            formatted.append(cell.rjust(padded_width))  # right-align
         else:
-            formatted.append(cell + pad)  # left-align
+            formatted.append(cell.ljust(padded_width))  # left-align
 
     return spacer.join(formatted)
 
 
+def compile_row_formatter(widths: list[int], is_numeric: list[bool], sep_width: int):
+    """ generates a format_row with this table's widths and alignments hardcoded, for rows that are full-width and uncolored """
+    cells = ', '.join(f"c[{i}].{'rjust' if num else 'ljust'}({width})" for i, (width, num) in enumerate(zip(widths, is_numeric)))
+    namespace = {}
+    exec(f"def format_plain_row(c): return {' ' * sep_width!r}.join([{cells}])", namespace)
+    return namespace['format_plain_row']
+
+
+format_row_py = format_row  # kept reachable, to check the compiled version against
+
+try:
+    from _fmt import format_row as format_row_compiled  # compiled version of format_row, if it was built (see setup.py)
+    format_row_compiled([], [], [], 0, False)            # builds from before the has_ansi argument don't take 5 args
+    format_row = format_row_compiled
+except (ImportError, TypeError):
+    pass
+
+
 # ——— Formatter class ——————————————————————————————
 class TableFormatter:
-    def __init__(self, lines: list[str], separator: int = DEFAULT_SEPARATOR):
+    def __init__(self, lines: Iterable[str], separator: int = DEFAULT_SEPARATOR, parallel: bool = False):
         self.separator = separator
-        self.rows: list[list[str]] = [split_row(line) for line in lines]
+        self.parallel = parallel
+        self.rows: list[list[str]] = []
+        self.rows_with_ansi: list[bool] = []  # per row; most rows have no colors, so they can skip all the ANSI handling
+        for line in lines:  # consumes lines lazily (e.g. straight from a file)
+            self.rows.append(split_row(line))
+            self.rows_with_ansi.append('\x1b' in line)
 
     def format(self) -> list[str]:
-        widths, is_numeric = detect_column_properties(self.rows)
-        return [format_row(row, widths, is_numeric, self.separator) for row in self.rows]
+        widths, is_numeric = detect_column_properties(self.rows, has_ansi=any(self.rows_with_ansi), parallel=self.parallel)
+        if len(self.rows) < CODEGEN_MIN_ROWS:
+            return [format_row(row, widths, is_numeric, self.separator, has_ansi)
+                    for row, has_ansi in zip(self.rows, self.rows_with_ansi)]
+
+        format_plain_row = compile_row_formatter(widths, is_numeric, self.separator)
+        num_cols = len(widths)
+        return [format_plain_row(row) if len(row) == num_cols and not has_ansi
+                else format_row(row, widths, is_numeric, self.separator, has_ansi)   # short or colored rows need the general version
+                for row, has_ansi in zip(self.rows, self.rows_with_ansi)]
 
     def print(self) -> None:
-        for line in self.format():
-            print(line)
+        sys.stdout.writelines(line + '\n' for line in self.format())  # goes through stdout's buffer instead of a print() per row
+
+    @staticmethod
+    def print_two_pass(file, separator: int = DEFAULT_SEPARATOR) -> None:
+        """ reads a seekable file twice (measure, then format) instead of holding its rows in memory """
+        widths, is_numeric = scan_column_properties(split_row(line) for line in file)
+        file.seek(0)
+        sys.stdout.writelines(format_row(split_row(line), widths, is_numeric, separator, '\x1b' in line) + '\n' for line in file)
 
 
 # ——— CLI Entry ———————————————————————————————————————
@@ -92,7 +197,7 @@ def main():
     parser.add_argument(
         'input',
         nargs='?',
-        type=argparse.FileType('r'),
+        type=argparse.FileType('r', encoding='utf-8', errors='replace'),     # invalid utf8 becomes '�' rather than crashing
         default=sys.stdin,
         help='Input file path or STDIN'
     )
@@ -102,10 +207,30 @@ def main():
         default=DEFAULT_SEPARATOR,
         help='Number of spaces to separate columns'
     )
+    parser.add_argument(
+        '--two-pass',
+        action='store_true',
+        help='Read the input file twice rather than keeping it in memory (for very large files; not for STDIN)'
+    )
+    parser.add_argument(
+        '--parallel',
+        action='store_true',
+        help='Analyze the columns of large tables in several processes'
+    )
     args = parser.parse_args()
-    lines = args.input.readlines()
 
-    formatter = TableFormatter(lines=lines, separator=args.separator)
+    if args.input is sys.stdin and hasattr(sys.stdin, 'reconfigure'):   # a replaced stdin (e.g. StringIO) is already text
+        sys.stdin.reconfigure(encoding='utf-8', errors='replace')       # same leniency as for a file path
+
+    if args.two_pass and args.parallel:
+        parser.error('--parallel can\'t be combined with --two-pass')
+    if args.two_pass:
+        if not args.input.seekable():
+            parser.error('--two-pass needs a file path as input')
+        TableFormatter.print_two_pass(args.input, separator=args.separator)
+        return
+
+    formatter = TableFormatter(lines=args.input, separator=args.separator, parallel=args.parallel)
     formatter.print()
 
 
@@ -11,6 +11,11 @@ from table_formatter import (  # module under test
     strip_ansi,
     TableFormatter,
     is_numeric_or_neutral,
+    detect_column_properties,
+    detect_column_properties_parallel,
+    format_row_py,
+    split_row,
+    scan_column_properties,
 )
 
 
@@ -100,6 +105,58 @@ def test_solution_unchanging():
     tf = TableFormatter(lines=smtouhou_data_organized)
     assert tf.format() == smtouhou_data_organized
 
+def test_parallel_matches_plain():
+    rows = [split_row(line) for line in sample_input + smtouhou_data]
+    assert detect_column_properties_parallel(rows, workers=3) == detect_column_properties(rows)
+    assert detect_column_properties_parallel([]) == ([], [])
+
+def test_scan_matches_detect():
+    rows = [split_row(line) for line in sample_input + smtouhou_data]
+    assert scan_column_properties(iter(rows)) == detect_column_properties(rows)
+
+def test_two_pass(tmp_path, script_path):
+    file_path = tmp_path / "input.txt"
+    file_path.write_text('\n'.join(sample_input))
+
+    proc = subprocess.run(
+        [sys.executable, script_path, '--two-pass', str(file_path)],
+        text=True,
+        capture_output=True,
+    )
+
+    assert proc.returncode == 0
+    assert proc.stdout.removesuffix('\n') == '\n'.join(sample_output)
+
+def test_compiled_row_formatter(monkeypatch):
+    import table_formatter
+    monkeypatch.setattr(table_formatter, 'CODEGEN_MIN_ROWS', 0)
+    assert TableFormatter(lines=sample_input).format() == sample_output
+    assert TableFormatter(lines=smtouhou_data).format() == smtouhou_data_organized
+
+@pytest.mark.parametrize("has_ansi", [True, False])
+def test_compiled_format_row_matches_python(has_ansi):
+    _fmt = pytest.importorskip("_fmt")
+    for lines in (sample_input, smtouhou_data):
+        rows = [split_row(line) for line in lines]
+        widths, is_numeric = detect_column_properties(rows)
+        for row in rows:
+            assert _fmt.format_row(row, widths, is_numeric, 2, has_ansi) == format_row_py(row, widths, is_numeric, 2, has_ansi)
+
+def test_non_utf8_input(script_path):
+    # invalid utf8 gets replaced with '�', the rest of the data is left as-is
+    file_path = os.path.join(os.path.dirname(script_path), "..", "testing", "non_utf8.txt")
+    with open(file_path, 'rb') as file:
+        file_contents = file.read().decode('utf-8', errors='replace').splitlines()
+
+    proc = subprocess.run(
+        [sys.executable, script_path, file_path],
+        text=True,
+        capture_output=True,
+    )
+
+    assert proc.returncode == 0
+    assert proc.stdout.splitlines() == file_contents
+
 # ——— ANSI‐Stripping Tests —————————————————————————————————————————————————————
 @pytest.mark.parametrize("ansi_str", [
     '\033[38;5;208mthis is my text\033[0m',